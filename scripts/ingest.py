@@ -1,82 +1,80 @@
 import os
-import json
-import hashlib
+import ijson
+import orjson
+import time
+import xxhash
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv, find_dotenv
 from pinecone import Pinecone
-from langchain_community.document_loaders import JSONLoader
 from src.models import PineconeRecord, SportsMetadata, PerformanceStat, GameContext
 
 load_dotenv(find_dotenv())
 
+UPSERT_BATCH_SIZE = 96  # upsert_records accepts at most 96 text records per request
+UPSERT_WORKERS = 8
+UPSERT_RETRIES = 3
+KEY_STATS = frozenset({"fieldGoalPct", "threePointPct", "freeThrowPct"})
+
 def clean_display_value(val: str) -> str:
     """Removes messy ratios like '354/492' and keeps core stats."""
     if not val: return "N/A"
-    parts = val.split(',')
-    cleaned = [p.strip() for p in parts if '/' not in p]
+    cleaned = [p for p in map(str.strip, val.split(',')) if '/' not in p]
     return ", ".join(cleaned) if cleaned else val
 
-def extract_leaders(comp: dict) -> list:
-    """Aggregates leaders from both Competition (Game) and Competitor (Team) levels."""
-    all_leaders = []
-    
-    if "leaders" in comp:
-        for cat in comp["leaders"]:
-            all_leaders.append({
-                "category": cat["displayName"],
-                "data": cat["leaders"][0] if cat.get("leaders") else None,
-                "team": None
-            })
-
-    for team_entry in comp.get("competitors", []):
-        team_name = team_entry["team"]["abbreviation"]
-        for cat in team_entry.get("leaders", []):
-            all_leaders.append({
-                "category": f"{team_name} {cat['displayName']}",
-                "data": cat["leaders"][0] if cat.get("leaders") else None,
-                "team": team_name
-            })
-            
-    return [l for l in all_leaders if l["data"]]
-
-def extract_team_stats(comp: dict) -> str:
-    """Extracts key team stats like FG% or 3P%."""
-    stats_summary = []
+def extract_event_aggregate(comp: dict) -> tuple:
+    """Walks the competitors once, collecting leaders, key team stats, scores and team names."""
+    leaders, team_stats, score_list, teams = [], [], [], []
+
+    # Game-level leaders first, then each team's own leaders
+    for cat in comp.get("leaders", []):
+        if cat.get("leaders"):
+            leaders.append((cat["displayName"], cat["leaders"][0], None))
+
     for c in comp.get("competitors", []):
-        abbr = c["team"]["abbreviation"]
-        key_stats = []
-        for stat in c.get("statistics", []):
-            if stat["name"] in ["fieldGoalPct", "threePointPct", "freeThrowPct"]:
-                key_stats.append(f"{stat['abbreviation']}: {stat['displayValue']}%")
+        team_name = c["team"]["abbreviation"]
+        teams.append(c["team"]["displayName"])
+        score_list.append(c.get("score", "0"))
+
+        for cat in c.get("leaders", []):
+            if cat.get("leaders"):
+                leaders.append((f"{team_name} {cat['displayName']}", cat["leaders"][0], team_name))
+
+        key_stats = [f"{stat['abbreviation']}: {stat['displayValue']}%"
+                     for stat in c.get("statistics", []) if stat["name"] in KEY_STATS]
         if key_stats:
-            stats_summary.append(f"{abbr} [{', '.join(key_stats)}]")
-    return " | ".join(stats_summary)
+            team_stats.append(f"{team_name} [{', '.join(key_stats)}]")
+
+    leaders = [{
+        "category": category,
+        "name": data.get('athlete', {}).get('displayName', 'Unknown'),
+        "value": clean_display_value(data.get('displayValue', '')),
+        "team": team
+    } for category, data, team in leaders]
 
-def transform_event_to_text(event: dict) -> str:
+    return leaders, " | ".join(team_stats), score_list, teams
+
+def transform_event_to_text(event: dict, aggregate: tuple = None) -> str:
     """Creates a rich, legible Knowledge Card."""
+    # Resolve nested lookups once up front
     comp = event.get("competitions", [{}])[0]
     status_obj = event.get("status", {}).get("type", {})
+    venue = comp.get("venue") or {}
+    odds_list = comp.get("odds") or [{}]
+    leaders, team_stats_text, score_list, teams = aggregate or extract_event_aggregate(comp)
     state = status_obj.get("state", "pre") # pre, in, post
     detail = status_obj.get("detail", "TBD")
     matchup = event.get("name", "Unknown Matchup")
     
-    score_line = " vs ".join([f"{c['team']['displayName']} ({c.get('score','0')})" for c in comp.get("competitors", [])])
-    
-    leaders = extract_leaders(comp)
-    leader_text_list = []
-    for l in leaders:
-        name = l['data'].get('athlete', {}).get('displayName', 'Unknown')
-        val = clean_display_value(l['data'].get('displayValue', ''))
-        leader_text_list.append(f"{l['category']}: {name} ({val})")
-    leader_text = " | ".join(leader_text_list)
-
-    team_stats_text = extract_team_stats(comp)
+    score_line = " vs ".join([f"{team} ({score})" for team, score in zip(teams, score_list)])
+    leader_text = " | ".join([f"{l['category']}: {l['name']} ({l['value']})" for l in leaders])
+
     stats_block = f"TEAM STATS: {team_stats_text}. " if team_stats_text else ""
 
-    venue = comp.get("venue", {}).get("fullName", "TBD")
-    odds = comp.get("odds", [{}])[0].get("details", "N/A") if comp.get("odds") else "N/A"
+    venue_name = venue.get("fullName", "TBD")
+    odds = odds_list[0].get("details", "N/A")
 
     if state == "pre":
-        return (f"PREVIEW: {matchup} at {venue}. TIME: {event.get('date')}. "
+        return (f"PREVIEW: {matchup} at {venue_name}. TIME: {event.get('date')}. "
                 f"ODDS: {odds}. "
                 f"PROJECTED LEADERS: {leader_text}.")
     elif state == "in":
@@ -88,7 +86,7 @@ def transform_event_to_text(event: dict) -> str:
                 f"{stats_block}"
                 f"TOP PERFORMERS: {leader_text}.")
 
-def extract_smart_metadata(raw_data: dict, filename: str, stable_id: str) -> SportsMetadata:
+def extract_smart_metadata(raw_data: dict, filename: str, stable_id: str, aggregate: tuple = None) -> SportsMetadata:
     is_news = "news" in filename
     sport = "nba" if "nba" in filename else "nfl"
     
@@ -96,39 +94,34 @@ def extract_smart_metadata(raw_data: dict, filename: str, stable_id: str) -> Spo
     context, team_stats_str = None, None
 
     # HASH is still useful for deduplication checking, but NOT for the ID
-    c_hash = hashlib.md5(json.dumps(raw_data, sort_keys=True).encode('utf-8')).hexdigest()
+    c_hash = xxhash.xxh3_128_hexdigest(orjson.dumps(raw_data, option=orjson.OPT_SORT_KEYS))
 
     if not is_news:
         comp = raw_data.get("competitions", [{}])[0]
         status_obj = raw_data.get("status", {}).get("type", {})
-        
-        for c in comp.get("competitors", []):
-            teams.append(c["team"]["displayName"])
-            score_list.append(f"{c['team']['displayName']} {c.get('score', '0')}")
-
-        raw_leaders = extract_leaders(comp)
-        for l in raw_leaders:
-            name = l['data'].get('athlete', {}).get('displayName', 'Unknown')
-            val = clean_display_value(l['data'].get('displayValue', ''))
-            athletes.append(name)
+        venue = comp.get("venue") or {}
+        odds_list = comp.get("odds")
+        leaders, team_stats_str, scores, teams = aggregate or extract_event_aggregate(comp)
+        score_list = [f"{team} {score}" for team, score in zip(teams, scores)]
+
+        for l in leaders:
+            athletes.append(l['name'])
             performers.append(PerformanceStat(
                 category=l['category'], 
-                athlete_name=name, 
-                display_value=val,
+                athlete_name=l['name'], 
+                display_value=l['value'],
                 team=l['team']
             ))
 
         weather = raw_data.get("weather", {}).get("displayValue", "")
-        odds_list = comp.get("odds", [])
         odds = odds_list[0].get("details") if odds_list else "N/A"
         context = GameContext(
-            venue=comp.get("venue", {}).get("fullName"),
-            location=comp.get("venue", {}).get("address", {}).get("city"),
+            venue=venue.get("fullName"),
+            location=venue.get("address", {}).get("city"),
             weather=weather,
             odds=odds,
             broadcast=raw_data.get("broadcast")
         )
-        team_stats_str = extract_team_stats(comp)
 
         headline = raw_data.get("name")
         event_date = raw_data.get("date")
@@ -145,35 +138,28 @@ def extract_smart_metadata(raw_data: dict, filename: str, stable_id: str) -> Spo
     return SportsMetadata(
         sport=sport, content_type="news" if is_news else "score",
         content_hash=c_hash, source_file=filename,
-        teams=list(set(teams)), athletes=list(set(athletes)),
+        teams=list(dict.fromkeys(teams)), athletes=list(dict.fromkeys(athletes)),
         headline=headline, event_date=event_date, status=status,
         performers=performers, context=context, scores=score_list,
         team_stats=team_stats_str
     )
 
-def run_ingestion():
-    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-    index = pc.Index("sports-data-index")
-
-    file_schema_map = {
-        "nba-news.json": ".articles[]?",
-        "nfl-news.json": ".articles[]?",
-        "nba-score.json": ".events[]?",
-        "nfl-score.json": ".events[]?"
-    }
-    
-    all_records = []
-    for filename, schema in file_schema_map.items():
-        file_path = f"data/{filename}"
-        if not os.path.exists(file_path): continue
-            
-        print(f"Processing {filename}...")
-        loader = JSONLoader(file_path=file_path, jq_schema=schema, text_content=False)
-        docs = loader.load()
-        
-        for doc in docs:
-            raw_json = json.loads(doc.page_content)
-            
+def upsert_batch(index, batch: list) -> int:
+    """Upserts a single batch, retrying with exponential backoff on failure."""
+    for attempt in range(UPSERT_RETRIES):
+        try:
+            index.upsert_records(namespace="sports-info", records=batch)
+            return len(batch)
+        except Exception as e:
+            if attempt == UPSERT_RETRIES - 1: raise
+            print(f"Batch upsert failed ({e}), retrying...")
+            time.sleep(2 ** attempt)
+
+def iter_items(file_path: str, schema: str):
+    """Streams (stable_id, raw item) pairs from one feed file."""
+    with open(file_path, "rb") as f:
+        # Stream items straight into dicts; use_float keeps numbers orjson-serializable
+        for raw_json in ijson.items(f, schema, use_float=True):
             # --- STABLE ID LOGIC ---
             # Use the actual Game ID or Article ID from ESPN
             # This ensures 'Patriots vs Broncos' always has the SAME Pinecone ID
@@ -181,34 +167,69 @@ def run_ingestion():
             entity_id = raw_json.get("id")
             if not entity_id:
                 # Fallback if no ID exists
-                entity_id = hashlib.md5(doc.page_content.encode()).hexdigest()
-            
-            stable_id = f"doc-{entity_id}"
-
-            smart_meta = extract_smart_metadata(raw_json, filename, stable_id)
-            
-            if smart_meta.content_type == "news":
-                chunk_text = f"NEWS: {smart_meta.headline}. {raw_json.get('description', '')}"
-            else:
-                chunk_text = transform_event_to_text(raw_json)
-            
-            meta_dict = smart_meta.model_dump(exclude_none=True)
-            if "performers" in meta_dict: 
-                meta_dict["performers"] = json.dumps([p.model_dump() for p in smart_meta.performers])
-            if "context" in meta_dict and smart_meta.context: 
-                meta_dict["context"] = json.dumps(smart_meta.context.model_dump())
-
-            all_records.append({
-                "id": stable_id, 
-                "chunk_text": chunk_text, 
-                **meta_dict
-            })
+                entity_id = xxhash.xxh3_128_hexdigest(orjson.dumps(raw_json))
+            yield f"doc-{entity_id}", raw_json
+
+def process_file(filename: str, schema: str) -> list[dict]:
+    """Streams one feed file and builds its Pinecone records, skipping repeated IDs."""
+    is_news = "news" in filename
+    records: dict[str, dict] = {}
+    for stable_id, raw_json in iter_items(f"data/{filename}", schema):
+        # ESPN feeds repeat IDs; skip duplicates before doing any work on them
+        if stable_id in records: continue
+
+        # Score events share one competitor walk between metadata and text
+        aggregate = None if is_news else extract_event_aggregate(raw_json.get("competitions", [{}])[0])
+        smart_meta = extract_smart_metadata(raw_json, filename, stable_id, aggregate)
+
+        if smart_meta.content_type == "news":
+            chunk_text = f"NEWS: {smart_meta.headline}. {raw_json.get('description', '')}"
+        else:
+            chunk_text = transform_event_to_text(raw_json, aggregate)
+
+        records[stable_id] = {
+            "id": stable_id, 
+            "chunk_text": chunk_text, 
+            **smart_meta.to_pinecone_metadata()
+        }
+    return list(records.values())
+
+def run_ingestion():
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index = pc.Index("sports-data-index")
+
+    file_schema_map = {
+        "nba-news.json": "articles.item",
+        "nfl-news.json": "articles.item",
+        "nba-score.json": "events.item",
+        "nfl-score.json": "events.item"
+    }
+    jobs = [(f, schema) for f, schema in file_schema_map.items() if os.path.exists(f"data/{f}")]
+    
+    # Each worker parses and builds a whole file, so only the small record dicts
+    # come back; cross-file dedup and the upsert below stay in this process.
+    all_records: dict[str, dict] = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+            futures = []
+            for filename, schema in jobs:
+                print(f"Processing {filename}...")
+                futures.append(pool.submit(process_file, filename, schema))
+            # Collect in file order so the first occurrence of an ID wins deterministically
+            for future in futures:
+                for rec in future.result():
+                    all_records.setdefault(rec["id"], rec)
 
     if all_records:
-        # Deduplicate locally
-        unique_records = list({r['id']: r for r in all_records}.values())
+        # Pinecone's Parquet bulk import isn't an option here: it needs precomputed
+        # vectors and doesn't support integrated-embedding indexes like this one.
+        unique_records = list(all_records.values())
         print(f"Upserting {len(unique_records)} records...")
-        index.upsert_records(namespace="sports-info", records=unique_records)
+        batches = [unique_records[i:i + UPSERT_BATCH_SIZE] for i in range(0, len(unique_records), UPSERT_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as pool:
+            futures = [pool.submit(upsert_batch, index, batch) for batch in batches]
+            for future in as_completed(futures):
+                future.result()
         print("Ingestion Complete!")
 
 if __name__ == "__main__":
@@ -1,37 +1,60 @@
 import os
 import httpx
+import time
 import asyncio
-import hashlib
+import xxhash
+from concurrent.futures import wait
 from typing import List
 from datetime import datetime
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from openai import OpenAI
+from pinecone.grpc import PineconeGRPC as Pinecone
+from openai import AsyncOpenAI
 from models import SportsMetadata, PerformanceStat, PineconeRecord, SearchOptimization
 
 load_dotenv()
 
+UPSERT_BATCH_SIZE = 100
+UPSERT_RETRIES = 3
+EMBED_BATCH_SIZE = 128  # texts per embeddings request (API max is 2048)
+EMBED_CONCURRENCY = 8
+
 class SportsDataSync:
     def __init__(self):
         self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        self.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.index = self.pc.Index("sports-data-index")
+        self.openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.index = self.pc.Index("sports-data-index", pool_threads=30)
+        self.http = httpx.AsyncClient(timeout=30, http2=True)
+        self.embed_limit = asyncio.Semaphore(EMBED_CONCURRENCY)
 
     async def fetch_api(self, sport: str, league: str, type: str):
         url = f"https://site.api.espn.com/apis/site/v2/sports/{sport}/{league}/{type}"
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            return resp.json(), sport, league, type
+        resp = await self.http.get(url)
+        return resp.json(), sport, league, type
 
     def generate_hash(self, text: str) -> str:
-        return hashlib.md5(text.encode()).hexdigest()
+        return xxhash.xxh3_128_hexdigest(text.encode())
+
+    async def aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        async with self.embed_limit:
+            resp = await self.openai.embeddings.create(
+                input=[t.replace("\n", " ") for t in texts], 
+                model="text-embedding-3-small",
+                dimensions=1024
+            )
+        return [d.embedding for d in resp.data]
 
-    def get_embedding(self, text: str) -> List[float]:
-        return self.openai.embeddings.create(
-            input=[text.replace("\n", " ")], 
-            model="text-embedding-3-small",
-            dimensions=1024
-        ).data[0].embedding
+    def upsert_batches(self, batches: List[List[dict]]):
+        """Fires every batch as an async gRPC upsert, retrying failed batches with backoff."""
+        pending = batches
+        for attempt in range(UPSERT_RETRIES):
+            futures = {self.index.upsert(vectors=batch, async_req=True): batch for batch in pending}
+            wait(futures)
+            failed = [(f, batch) for f, batch in futures.items() if f.exception()]
+            if not failed: return
+            if attempt == UPSERT_RETRIES - 1: raise failed[0][0].exception()
+            print(f"{len(failed)} batch upserts failed, retrying...")
+            pending = [batch for _, batch in failed]
+            time.sleep(2 ** attempt)
 
     def process_news(self, data, sport, league) -> List[PineconeRecord]:
         records = []
@@ -51,7 +74,6 @@ class SportsDataSync:
                 athletes=athletes,
                 teams=teams,
                 discovery=SearchOptimization(
-                    keywords=athletes + teams + [art['headline']],
                     hashtags=[f"#{t.replace(' ', '')}" for t in teams],
                     social_handles=[cat.get("guid") for cat in art.get("categories", []) if cat.get("type") == "guid"]
                 )
@@ -76,7 +98,6 @@ class SportsDataSync:
                 scores=scores,
                 teams=[t['team']['displayName'] for t in comp['competitors']],
                 discovery=SearchOptimization(
-                    keywords=[ev['name']] + scores,
                     suggested_queries=[f"{ev['name']} latest score", f"{ev['name']} highlights"]
                 )
             )
@@ -90,7 +111,10 @@ class SportsDataSync:
             self.fetch_api("football", "nfl", "scoreboard"),
             self.fetch_api("basketball", "nba", "scoreboard")
         ]
-        results = await asyncio.gather(*tasks)
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            await self.http.aclose()
         
         all_records = []
         for data, sport, league, dtype in results:
@@ -100,17 +124,23 @@ class SportsDataSync:
                 all_records.extend(self.process_scores(data, sport, league))
 
         # Vectorize and Upsert
+        texts = [f"{rec.metadata.headline}: {rec.metadata.summary or ''}" for rec in all_records]
+        embedded = await asyncio.gather(*[
+            self.aembed_batch(texts[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(texts), EMBED_BATCH_SIZE)
+        ])
+        vectors = [v for batch in embedded for v in batch]
+
         upserts = []
-        for rec in all_records:
-            vector = self.get_embedding(f"{rec.metadata.headline}: {rec.metadata.summary or ''}")
+        for rec, vector in zip(all_records, vectors):
             upserts.append({
                 "id": rec.id, 
                 "values": vector, 
-                "metadata": rec.metadata.model_dump(exclude_none=True)
+                "metadata": rec.metadata.to_pinecone_metadata()
             })
 
         if upserts:
-            self.index.upsert(vectors=upserts)
+            batches = [upserts[i:i + UPSERT_BATCH_SIZE] for i in range(0, len(upserts), UPSERT_BATCH_SIZE)]
+            self.upsert_batches(batches)
             print(f"Sync Complete: {len(upserts)} items updated.")
 
 if __name__ == "__main__":
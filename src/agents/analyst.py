@@ -1,4 +1,6 @@
 import os
+import asyncio
+from functools import lru_cache
 from dotenv import load_dotenv, find_dotenv
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
@@ -10,8 +12,13 @@ load_dotenv(find_dotenv())
 
 # --- 1. Define the Tools ---
 
+@lru_cache(maxsize=1)
+def _get_retriever() -> SportsRetriever:
+    """Builds the Pinecone-backed retriever once and reuses it across tool calls."""
+    return SportsRetriever()
+
 @tool
-def search_knowledge_base(query: str, sport: str = None):
+async def search_knowledge_base(query: str, sport: str = None):
     """
     Search the sports database for scores, stats, and news.
     Always use this tool to answer questions about games, teams, or players.
@@ -20,16 +27,15 @@ def search_knowledge_base(query: str, sport: str = None):
         query: The user's question (e.g. "Who won the Patriots game?").
         sport: (Optional) 'nba' or 'nfl'.
     """
-    retriever = SportsRetriever()
-    results = retriever.search(query, sport=sport, top_k=4)
+    results = await _get_retriever().asearch(query, sport=sport, top_k=4)
     
-    context = ""
+    parts = []
     for i, res in enumerate(results):
-        context += f"\n[Result {i+1}] {res['text']}"
+        parts.append(f"[Result {i+1}] {res['text']}")
         if res.get('context'):
-            context += f"\nContext: {res['context']}"
+            parts.append(f"Context: {res['context']}")
             
-    return context if context else "No results found in the database."
+    return "\n".join(parts) if parts else "No results found in the database."
 
 # --- 2. Define the Agent Factory ---
 
@@ -47,7 +53,7 @@ def create_analyst_agent():
 
 # --- 3. Interactive Test Loop ---
 
-if __name__ == "__main__":
+async def main():
     print("🤖 Sports Analyst Agent Online (Universal Mode)...")
     
     agent_graph = create_analyst_agent()
@@ -66,7 +72,7 @@ if __name__ == "__main__":
     
     while True:
         try:
-            user_input = input("\nYou: ")
+            user_input = await asyncio.to_thread(input, "\nYou: ")
             if user_input.lower() in ["quit", "exit"]:
                 break
             
@@ -74,10 +80,13 @@ if __name__ == "__main__":
             # For this test loop, we just prepend it to the current turn.
             messages = [system_prompt, HumanMessage(content=user_input)]
             
-            response = agent_graph.invoke({"messages": messages}, config)
+            response = await agent_graph.ainvoke({"messages": messages}, config)
             
             # Extract the final AI message
             print(f"\nAnalyst: {response['messages'][-1].content}")
             
         except Exception as e:
-            print(f"❌ Error: {e}")
\ No newline at end of file
+            print(f"❌ Error: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
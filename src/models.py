@@ -1,3 +1,4 @@
+import orjson
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
@@ -14,6 +15,11 @@ class GameContext(BaseModel):
     odds: Optional[str] = None
     broadcast: Optional[str] = None
 
+class SearchOptimization(BaseModel):
+    hashtags: List[str] = Field(default_factory=list)
+    social_handles: List[str] = Field(default_factory=list)
+    suggested_queries: List[str] = Field(default_factory=list)
+
 class SportsMetadata(BaseModel):
     # System Fields
     sport: str             # "nba" or "nfl"
@@ -27,6 +33,7 @@ class SportsMetadata(BaseModel):
     
     # Event Info
     headline: Optional[str] = None
+    summary: Optional[str] = None
     event_date: Optional[str] = None
     status: Optional[str] = None # "pre", "in", "post"
     
@@ -35,6 +42,19 @@ class SportsMetadata(BaseModel):
     performers: List[PerformanceStat] = Field(default_factory=list)
     context: Optional[GameContext] = None
     team_stats: Optional[str] = None # e.g. "NYK: 50% FG | SAC: 43% FG"
+    discovery: Optional[SearchOptimization] = None
+
+    def to_pinecone_metadata(self) -> Dict[str, Any]:
+        """Flat metadata for Pinecone: drops None fields and stores nested models as JSON strings."""
+        meta = {}
+        for key, value in self.__dict__.items():
+            if value is None: continue
+            if isinstance(value, BaseModel):
+                value = orjson.dumps(value.__dict__).decode()
+            elif value and isinstance(value, list) and isinstance(value[0], BaseModel):
+                value = orjson.dumps([v.__dict__ for v in value]).decode()
+            meta[key] = value
+        return meta
 
 class PineconeRecord(BaseModel):
     id: str
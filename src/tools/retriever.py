@@ -1,5 +1,6 @@
 import os
-import json
+import asyncio
+import orjson
 from dotenv import load_dotenv, find_dotenv
 from pinecone import Pinecone
 
@@ -45,14 +46,14 @@ class SportsRetriever:
                 performers = []
                 if "performers" in fields:
                     try:
-                        performers = json.loads(fields["performers"])
+                        performers = orjson.loads(fields["performers"])
                     except:
                         pass
 
                 context = {}
                 if "context" in fields:
                     try:
-                        context = json.loads(fields["context"])
+                        context = orjson.loads(fields["context"])
                     except:
                         pass
 
@@ -69,4 +70,10 @@ class SportsRetriever:
 
         except Exception as e:
             print(f"❌ Retrieval Error: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    async def asearch(self, query: str, sport: str = None, top_k: int = 3):
+        """
+        Runs search() in a worker thread so callers on an event loop aren't blocked.
+        """
+        return await asyncio.to_thread(self.search, query, sport, top_k)
\ No newline at end of file